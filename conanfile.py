@@ -1,18 +1,65 @@
 from conan import ConanFile
-from conan.tools.files import rmdir, rm, copy, rename, replace_in_file
-from conan.tools.build import check_min_cppstd
+from conan.tools.files import rmdir, load, save
+from conan.tools.build import check_min_cppstd, build_jobs
 from conan.tools.scm import Git
 from conan.tools.layout import basic_layout
 from conan.tools.microsoft import is_msvc, check_min_vs, is_msvc_static_runtime
 from conan.tools.scm import Version
-from conan.errors import ConanInvalidConfiguration
+from conan.errors import ConanException, ConanInvalidConfiguration
 from conan.tools.microsoft import MSBuild, VCVars
 from conan.tools.gnu import Autotools, AutotoolsToolchain
-from conan.tools.env import VirtualBuildEnv
+from conan.tools.env import VirtualBuildEnv, Environment
+from concurrent.futures import ThreadPoolExecutor
+from functools import cached_property
 from pathlib import Path
+from types import MappingProxyType
+from fnmatch import fnmatch
+import hashlib
+import json
 import os
-
-required_conan_version = ">=1.50.0"
+import re
+import shutil
+import subprocess
+import time
+
+required_conan_version = ">=1.53.0"
+
+# Conan to Genie translation maps; read-only, as every recipe instance shares them
+_VS_VER_TO_GENIE = MappingProxyType({"17": "2022", "16": "2019", "15": "2017",
+                                     "194": "2022", "193": "2022", "192": "2019", "191": "2017"})
+# {compiler} is replaced by the conan compiler name
+_OS_TO_GENIE_GCC = MappingProxyType({"Windows": "mingw-{compiler}", "Linux": "linux-{compiler}",
+                                     "FreeBSD": "freebsd", "Macos": "osx",
+                                     "Android": "android", "iOS": "ios"})
+_GMAKE_OS_TO_PROJ = MappingProxyType({"Windows": "mingw", "Linux": "linux", "FreeBSD": "freebsd", "Macos": "osx", "Android": "android", "iOS": "ios"})
+_GMAKE_ANDROID_ARCH_TO_GENIE_SUFFIX = MappingProxyType({"x86": "-x86", "x86_64": "-x86_64", "armv8": "-arm64", "armv7": "-arm"})
+_GMAKE_ARCH_TO_GENIE_SUFFIX = MappingProxyType({"x86": "-x86", "x86_64": "-x64", "armv8": "-arm64", "armv7": "-arm"})
+_OS_TO_USE_ARCH_CONFIG_SUFFIX = MappingProxyType({"Windows": False, "Linux": False, "FreeBSD": False, "Macos": True, "Android": True, "iOS": True})
+
+_BUILD_TYPE_TO_MAKE_CONFIG = MappingProxyType({"Debug": "debug", "Release": "release"})
+_ARCH_TO_MAKE_CONFIG_SUFFIX = MappingProxyType({"x86": "32", "x86_64": "64"})
+_OS_TO_USE_MAKE_CONFIG_SUFFIX = MappingProxyType({"Windows": True, "Linux": True, "FreeBSD": True, "Macos": False, "Android": False, "iOS": False})
+
+# Output folders of bx's toolchain.lua for non-msvc builds; {bits} and {compiler} are filled from settings
+_OS_TO_BUILD_OUT_DIR = MappingProxyType({"Windows": "win{bits}_mingw-{compiler}", "Linux": "linux{bits}_{compiler}", "FreeBSD": "freebsd"})
+
+# Marks bimg's genie.lua as already carrying the LTO settings
+_LTO_GENIE_MARKER = "-- bimg-conan: link time optimization"
+
+# Assignment in bimg's genie.lua of the folder genie generates projects, objects and binaries into
+_BIMG_BUILD_DIR_RE = re.compile(r"^(local BIMG_BUILD_DIR\s*=\s*)", re.MULTILINE)
+_BIMG_BUILD_DIR_OVERRIDE = "os.getenv(\"BIMG_BUILD_DIR\") or "
+
+# Library kinds besides the plain bimg library, as they appear right after "bimg" in build outputs, e.g. libbimg_encodeRelease.a
+_BIMG_LIB_KIND_RE = re.compile(r"bimg(_encode|_decode)?")
+
+_COMPILER_REQUIRED = MappingProxyType({
+    "gcc": "8",
+    "clang": "11",
+    "apple-clang": "12",
+    "msvc": "192",
+    "Visual Studio": "16"
+})
 
 
 class bimgConan(ConanFile):
@@ -23,8 +70,8 @@ class bimgConan(ConanFile):
     description = "Cross-platform, graphics API agnostic, \"Bring Your Own Engine/Framework\" style rendering library."
     topics = ("lib-static", "C++", "C++17", "image", "utility")
     settings = "os", "compiler", "arch", "build_type"
-    options = {"fPIC": [True, False], "tools": [True, False], "rtti": [True, False], "bx_version": [None, "ANY"]}
-    default_options = {"fPIC": True, "tools": False, "rtti": True}
+    options = {"fPIC": [True, False], "tools": [True, False], "rtti": [True, False], "ccache": [True, False], "lto": [True, False], "tmpfs_build": [True, False], "bx_version": [None, "ANY"]}
+    default_options = {"fPIC": True, "tools": False, "rtti": True, "ccache": False, "lto": False, "tmpfs_build": False}
 
     invalidPackageExceptionText = "Less lib files found for copy than expected. Aborting."
     expectedNumLibs = 3
@@ -37,6 +84,25 @@ class bimgConan(ConanFile):
     def _bimg_url(self):
         return "https://github.com/bkaradzic/bimg.git"
 
+    @property
+    def _git_clone_args(self):
+        # Only master's commits are needed: skip other branches, tags and trees until a checkout asks for them
+        return ["--filter=tree:0", "--single-branch", "--no-tags", "--branch", "master"]
+
+    @property
+    def _git_cache_folder(self):
+        # Overridable so CI can point it at a folder that is persisted between jobs
+        return os.environ.get("BIMG_CONAN_CACHE", os.path.join(Path.home(), ".cache", "bimg-conan"))
+
+    @property
+    def _version_cache_file(self):
+        return os.path.join(self._git_cache_folder, "version_cache.json")
+
+    @property
+    def _version_cache_ttl(self):
+        # Seconds during which the cached version is used without asking the remote at all
+        return 60 * 60
+
     @property
     def _bx_folder(self):
         return "bx"
@@ -45,11 +111,41 @@ class bimgConan(ConanFile):
     def _bimg_folder(self):
         return "bimg"
 
-    @property
+    @cached_property
     def _bimg_path(self):
         return os.path.join(self.source_folder, self._bimg_folder)
 
-    @property
+    # Settings as plain strings, for indexing the lookup tables above
+    @cached_property
+    def _os_str(self):
+        return str(self.settings.os)
+
+    @cached_property
+    def _arch_str(self):
+        return str(self.settings.arch)
+
+    @cached_property
+    def _compiler_str(self):
+        return str(self.settings.compiler)
+
+    @cached_property
+    def _compiler_version_str(self):
+        return str(self.settings.compiler.version)
+
+    @cached_property
+    def _tmpfs_build_dir(self):
+        # None when the build tree stays on disk
+        if not self.options.get_safe("tmpfs_build") or not os.path.isdir("/dev/shm"):
+            return None
+        # Named after the source folder, so rebuilds of the same tree reuse it rather than leaking a new one
+        return os.path.join("/dev/shm", f"bimg-conan-{hashlib.sha1(self._bimg_path.encode()).hexdigest()[:12]}")
+
+    @cached_property
+    def _build_dir(self):
+        # Where genie puts projects, objects and binaries
+        return self._tmpfs_build_dir or os.path.join(self._bimg_path, ".build")
+
+    @cached_property
     def _genie_extra(self):
         genie_extra = ""
         if is_msvc(self) and not is_msvc_static_runtime(self):
@@ -58,21 +154,21 @@ class bimgConan(ConanFile):
             genie_extra += " --with-tools"
         return genie_extra
 
-    @property
+    @cached_property
     def _lib_target_prefix(self):
         if self.settings.os == "Windows":
             return "libs\\"
         else:
             return ""
 
-    @property
+    @cached_property
     def _tool_target_prefix(self):
         if self.settings.os == "Windows":
             return "tools\\"
         else:
             return ""
 
-    @property
+    @cached_property
     def _projs(self):
         projs = [f"{self._lib_target_prefix}bimg", f"{self._lib_target_prefix}bimg_decode", f"{self._lib_target_prefix}bimg_encode"]
         if self.options.tools:
@@ -80,14 +176,120 @@ class bimgConan(ConanFile):
         return projs
 
     @property
-    def _compiler_required(self):
-        return {
-            "gcc": "8",
-            "clang": "11",
-            "apple-clang": "12",
-            "msvc": "192",
-            "Visual Studio": "16"
-        }
+    def _genie_vs(self):
+        return f"vs{_VS_VER_TO_GENIE[self._compiler_version_str]}"
+
+    @property
+    def _genie_arch_suffix(self):
+        # Appended to both genie's --gcc value and the project folder it generates
+        if not _OS_TO_USE_ARCH_CONFIG_SUFFIX[self._os_str]:
+            return ""
+        if self.settings.os == "Android":
+            return _GMAKE_ANDROID_ARCH_TO_GENIE_SUFFIX[self._arch_str]
+        return _GMAKE_ARCH_TO_GENIE_SUFFIX[self._arch_str]
+
+    @cached_property
+    def _proj_folder(self):
+        # Folder genie generates gmake projects into
+        return f"gmake-{_GMAKE_OS_TO_PROJ[self._os_str]}-{self._compiler_str}{self._genie_arch_suffix}"
+
+    @cached_property
+    def _proj_path(self):
+        return os.path.join(self._build_dir, "projects", self._proj_folder)
+
+    @cached_property
+    def _make_conf(self):
+        # Config name the generated gmake projects use for the current settings
+        config = _BUILD_TYPE_TO_MAKE_CONFIG[str(self.settings.build_type)]
+        if _OS_TO_USE_MAKE_CONFIG_SUFFIX[self._os_str]:
+            config += _ARCH_TO_MAKE_CONFIG_SUFFIX[self._arch_str]
+        return config
+
+    # Build plan: everything build() runs is derived from settings and options alone, so it is worked out up front
+    # and build() only has to execute it
+    @cached_property
+    def _jobs(self):
+        # Single parallelism knob for every backend; honours tools.build:jobs and defaults to the cpu count
+        return build_jobs(self)
+
+    @cached_property
+    def _genie_cmd(self):
+        if is_msvc(self):
+            return f"genie {self._genie_extra} {self._genie_vs}"
+        # Read by genie.lua once patchBuildDirForTmpfs() has patched it
+        build_dir_env = f"BIMG_BUILD_DIR=\"{self._tmpfs_build_dir}\" " if self._tmpfs_build_dir is not None else ""
+        # Not sure if XCode can be spefically handled by conan for building through, so assume everything not VS is make
+        # gcc-multilib and g++-multilib required for 32bit cross-compilation, should see if we can check and install through conan
+        genie_gcc = _OS_TO_GENIE_GCC[self._os_str].format(compiler=self._compiler_str)
+        return f"{build_dir_env}genie {self._genie_extra} --gcc={genie_gcc}{self._genie_arch_suffix} gmake"
+
+    @cached_property
+    def _genie_generated(self):
+        # Project file genie writes for the current settings, which tells whether generation can be skipped
+        if is_msvc(self):
+            return os.path.join(self._build_dir, "projects", self._genie_vs, "bimg.sln")
+        return os.path.join(self._proj_path, "Makefile")
+
+    @cached_property
+    def _msbuild_cmd(self):
+        # Command building only the required projects of the solution; make goes through Autotools with _make_args
+        msbuild = MSBuild(self)
+        # customize to Release when RelWithDebInfo
+        msbuild.build_type = "Debug" if self.settings.build_type == "Debug" else "Release"
+        # use Win32 instead of the default value when building x86
+        msbuild.platform = "Win32" if self.settings.arch == "x86" else msbuild.platform
+        msbuild_cmd = msbuild.command(self._genie_generated, targets=self._projs)
+        # /m only runs projects in parallel; CL_MPCount also has cl.exe compile each project's files in parallel,
+        # and the multi-tool task settings make both levels share one pool of jobs instead of spawning jobs * jobs
+        if "/m:" not in msbuild_cmd:
+            msbuild_cmd += f" /m:{self._jobs}"
+        msbuild_cmd += f" /p:CL_MPCount={self._jobs} /p:UseMultiToolTask=true /p:EnforceProcessCountAcrossBuilds=true"
+        return msbuild_cmd
+
+    @cached_property
+    def _make_args(self):
+        proj_path = self._proj_path
+        if self.settings.os == "Windows":
+            proj_path = proj_path.replace("\\", "/") # Fix path for linux style...
+        make_args = ["-R", "-C", f"\"{proj_path}\"", f"config={self._make_conf}", f"-j{self._jobs}"]
+        if self.settings.os == "Windows":
+            if "msys2" in self.dependencies.build:
+                make_args.append("MINGW=$MSYS_ROOT/mingw64")
+            else:
+                make_args.append("MINGW=$MINGW") # user is expected to have an env var pointing to mingw; x86_64-w64-mingw32-g++ is expected in $MINGW/bin/
+        return make_args
+
+    @property
+    def _lto_genie_patch(self):
+        if is_msvc(self):
+            build_flags, link_flags = ["/GL"], ["/LTCG"]
+        elif self.settings.compiler == "gcc":
+            # Fat objects keep the static libs linkable by consumers that do not use LTO themselves
+            build_flags, link_flags = ["-flto=auto", "-ffat-lto-objects"], ["-flto=auto"]
+        else:
+            build_flags, link_flags = ["-flto"], ["-flto"]
+        build_options = ", ".join(f"\"{flag}\"" for flag in build_flags)
+        link_options = ", ".join(f"\"{flag}\"" for flag in link_flags)
+        # Re-selecting the solution applies the Release settings to every project in it
+        return (f"\n{_LTO_GENIE_MARKER}\n"
+                f"solution \"bimg\"\n"
+                f"\tconfiguration {{ \"Release\" }}\n"
+                f"\t\tbuildoptions {{ {build_options} }}\n"
+                f"\t\tlinkoptions {{ {link_options} }}\n"
+                f"\tconfiguration {{}}\n")
+
+    @property
+    def _expected_build_bin(self):
+        # Output folder bx's toolchain.lua picks for the current settings; None where it is not mapped
+        bits = "64" if self.settings.arch in ["x86_64", "armv8"] else "32"
+        if is_msvc(self):
+            out_dir = f"win{bits}_{self._genie_vs}"
+        else:
+            out_dir = _OS_TO_BUILD_OUT_DIR.get(self._os_str)
+        if out_dir is None:
+            return None
+        out_dir = out_dir.format(bits=bits, compiler=self._compiler_str)
+        return os.path.join(self._build_dir, out_dir, "bin")
 
     @property
     def _settings_build(self):
@@ -96,6 +298,17 @@ class bimgConan(ConanFile):
     def config_options(self):
         if self.settings.os == "Windows":
             del self.options.fPIC
+        if self.settings.os == "Windows" or self._settings_build.os == "Windows":
+            # ccache is hooked in through compiler-named symlinks, which need a non-Windows build machine and toolchain
+            del self.options.ccache
+        if self._settings_build.os != "Linux":
+            # Relies on the /dev/shm tmpfs mount
+            del self.options.tmpfs_build
+
+    def configure(self):
+        # LTO only pays off in optimized builds, and slows down debug ones for nothing
+        if self.settings.build_type != "Release":
+            self.options.rm_safe("lto")
 
     def layout(self):
         basic_layout(self, src_folder="src")
@@ -110,20 +323,40 @@ class bimgConan(ConanFile):
     def package_id(self):
         if self.info.settings.compiler == "msvc":
             del self.info.settings.compiler.cppstd
+        # The compiler cache and build location do not affect the produced binaries
+        self.info.options.rm_safe("ccache")
+        self.info.options.rm_safe("tmpfs_build")
 
     def set_version(self):
         if not self.version:
             self.output.info("Setting version from git.")
-            rmdir(self, self._bimg_folder)
-            git = Git(self, folder=self._bimg_folder)
-            git.clone(self._bimg_url, target=".", args=["--filter=tree:0"])
+            cached = self.loadVersionCache()
+            if cached["master"] and time.time() - os.path.getmtime(self._version_cache_file) < self._version_cache_ttl:
+                self.version = cached["versions"][cached["master"]]["version"]
+                self.output.highlight(f"Version {self.version} (cached)")
+                return
+            # Cache is stale; a ref advertisement is enough to tell whether master moved to a commit we already know
+            sha = Git(self).run(f"ls-remote {self._bimg_url} refs/heads/master").split()[0]
+            if sha in cached["versions"]:
+                cached["master"] = sha
+                self.saveVersionCache(cached)
+                self.version = cached["versions"][sha]["version"]
+                self.output.highlight(f"Version {self.version} (known commit)")
+                return
+
+            # Count on the same mirror source() resolves commits from, so bimg's history is only ever fetched into one place
+            cache = self.updateGitCache(self._bimg_folder, self._bimg_url, sha)
             # Hackjob semver! Versioning by commit seems rather annoying for users, so let's version by commit count
-            numCommits = int(git.run("rev-list --count master"))
+            # Counting the advertised sha rather than master keeps the count and the cache key in agreement
+            numCommits = int(self.gitOutput(["rev-list", "--count", sha], cache))
             verMajor = 1 + (numCommits // 10000)
             verMinor = (numCommits // 100) % 100
             verRev = numCommits % 100
             self.output.highlight(f"Version {verMajor}.{verMinor}.{verRev}")
             self.version = f"{verMajor}.{verMinor}.{verRev}"
+            cached["master"] = sha
+            cached["versions"][sha] = {"count": numCommits, "version": self.version}
+            self.saveVersionCache(cached)
 
     def validate(self):
         if not self.options.get_safe("fPIC", True):
@@ -135,7 +368,7 @@ class bimgConan(ConanFile):
         check_min_vs(self, 191)
         if not is_msvc(self):
             try:
-                minimum_required_compiler_version = self._compiler_required[str(self.settings.compiler)]
+                minimum_required_compiler_version = _COMPILER_REQUIRED[self._compiler_str]
                 if Version(self.settings.compiler.version) < minimum_required_compiler_version:
                     raise ConanInvalidConfiguration("This package requires C++17 support. The current compiler does not support it.")
             except KeyError:
@@ -145,6 +378,8 @@ class bimgConan(ConanFile):
 
     def build_requirements(self):
         self.tool_requires("genie/1181")
+        if self.options.get_safe("ccache") and not shutil.which("ccache"):
+            self.tool_requires("ccache/[>=4.8]")
         if not is_msvc(self) and self._settings_build.os == "Windows":
             if self.settings.os == "Windows": # building for windows mingw
                 self.win_bash = True
@@ -155,22 +390,93 @@ class bimgConan(ConanFile):
         if self.settings.os == "Android" and "ANDROID_NDK_ROOT" not in os.environ:
             self.tool_requires("android-ndk/[>=r26d]")
 
-    def cloneVersion(self, folder, url, version):
-        git = Git(self, folder=folder)
-        git.clone(url, target=".", args=["--filter=tree:0"])
-        self.output.info(f"Getting {folder} version {version}")
-        numCommitsLatest = int(git.run("rev-list --count master"))
+    def runGit(self, args, cwd, check=True, **kwargs):
+        # git is called directly rather than through the Git helper, which changes the process working directory and
+        # so cannot be used from several threads at once, or through self.run, which goes through msys bash for mingw
+        # builds (win_bash), where cwd is not honoured and git may not be on the PATH
+        result = subprocess.run(["git"] + args, cwd=cwd, text=True, **kwargs)
+        if check and result.returncode != 0:
+            raise ConanException(f"git {' '.join(args)} failed in {cwd} with exit code {result.returncode}")
+        return result
+
+    def hasCommit(self, repo, sha):
+        return self.runGit(["cat-file", "-e", f"{sha}^{{commit}}"], repo, check=False, stderr=subprocess.DEVNULL).returncode == 0
+
+    def updateGitCache(self, name, url, sha=None):
+        # Bare mirror of master kept across conan invocations, so clones only fetch new objects from the network
+        cache = os.path.join(self._git_cache_folder, f"{name}.git")
+        if os.path.isdir(cache):
+            # A warm mirror whose master is already the wanted commit needs nothing from the network. Probing for the
+            # object instead would not do: the treeless mirror is a partial clone, where git lazily fetches missing objects
+            if sha is not None and self.gitOutput(["rev-parse", "refs/heads/master"], cache) == sha:
+                return cache
+            self.runGit(["fetch", "--prune", "--no-tags", "origin", "+refs/heads/master:refs/heads/master"], cache)
+        else:
+            os.makedirs(self._git_cache_folder, exist_ok=True)
+            self.runGit(["clone", "--bare"] + self._git_clone_args + [url, f"{name}.git"], self._git_cache_folder)
+        return cache
+
+    def loadVersionCache(self):
+        # {"master": last seen master sha, "versions": {sha: {"count": commit count, "version": version}}}
+        try:
+            with open(self._version_cache_file) as f:
+                cached = json.load(f)
+            if isinstance(cached.get("versions"), dict) and isinstance(cached["versions"].get(cached.get("master")), dict):
+                return cached
+        except (OSError, ValueError, AttributeError):
+            pass
+        return {"master": None, "versions": {}}
+
+    def saveVersionCache(self, cached):
+        # Write to a temporary file and swap it in, so concurrent conan runs never read a partial file
+        os.makedirs(self._git_cache_folder, exist_ok=True)
+        tmp_file = f"{self._version_cache_file}.{os.getpid()}.tmp"
+        with open(tmp_file, "w") as f:
+            json.dump(cached, f)
+        os.replace(tmp_file, self._version_cache_file)
+
+    def versionSha(self, version):
+        # Commit set_version() derived this version from, if it is cached
+        return next((sha for sha, entry in self.loadVersionCache()["versions"].items() if entry.get("version") == str(version)), None)
+
+    def versionCommitCount(self, version):
         splitVer = str(version).split(".")
-        numCommitsBack = numCommitsLatest - (int(splitVer[2]) + int(splitVer[1]) * 100 + (int(splitVer[0]) - 1) * 10000)
-        if numCommitsBack > 0:
-            git.run(f"checkout HEAD~{numCommitsBack}")
-        self.output.info(git.run("show -s"))
+        return int(splitVer[2]) + int(splitVer[1]) * 100 + (int(splitVer[0]) - 1) * 10000
+
+    def gitOutput(self, args, cwd):
+        return self.runGit(args, cwd, stdout=subprocess.PIPE).stdout.strip()
+
+    def mirrorSha(self, name, url, version):
+        # Resolve the version to a commit in the local mirror, which is the only place that needs history
+        cache = self.updateGitCache(name, url)
+        numCommitsBack = int(self.gitOutput(["rev-list", "--count", "master"], cache)) - self.versionCommitCount(version)
+        return self.gitOutput(["rev-parse", f"master~{max(numCommitsBack, 0)}"], cache)
+
+    def fetchVersion(self, folder, url, version, sha=None):
+        if sha is None:
+            sha = self.mirrorSha(folder, url, version)
+        path = os.path.join(self.source_folder, folder)
+        if not os.path.isdir(os.path.join(path, ".git")):
+            os.makedirs(path, exist_ok=True)
+            self.runGit(["init", "-q"], path)
+        # Shallow fetch of just the wanted commit; a checkout left by a previous source() run may already have it
+        if not self.hasCommit(path, sha):
+            self.runGit(["fetch", "--depth=1", "--no-tags", url, sha], path)
+        self.runGit(["checkout", "-q", "--detach", sha], path)
 
     def source(self):
         # bimg requires bx source to build;
         self.output.info("Getting source")
-        self.cloneVersion(self._bx_folder, self._bx_url, self.dependencies["bx"].ref.version)
-        self.cloneVersion(self._bimg_folder, self._bimg_url, self.version)
+        versions = {self._bx_folder: self.dependencies["bx"].ref.version, self._bimg_folder: self.version}
+        # The fetches are network bound and independent, so overlap them
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            fetches = [executor.submit(self.fetchVersion, self._bx_folder, self._bx_url, versions[self._bx_folder]),
+                       executor.submit(self.fetchVersion, self._bimg_folder, self._bimg_url, self.version, self.versionSha(self.version))]
+            for fetch in fetches:
+                fetch.result()
+        for folder, version in versions.items():
+            self.output.info(f"Got {folder} version {version}")
+            self.output.info(Git(self, folder=folder).run("show -s"))
 
     def generate(self):
         vbe = VirtualBuildEnv(self)
@@ -181,13 +487,51 @@ class bimgConan(ConanFile):
         else:
             tc = AutotoolsToolchain(self)
             tc.generate()
+            if self.options.get_safe("ccache"):
+                self.generateCcacheWrappers()
+
+    def generateCcacheWrappers(self):
+        # ccache's masquerade mode: symlinks named after the compilers, put first in PATH, make the
+        # genie gmake builds go through ccache without touching the generated projects
+        if "ccache" in self.dependencies.build:
+            ccache = os.path.join(self.dependencies.build["ccache"].cpp_info.bindirs[0], "ccache")
+        else:
+            ccache = shutil.which("ccache")
+        wrapper_folder = os.path.join(self.generators_folder, "ccache")
+        os.makedirs(wrapper_folder, exist_ok=True)
+        for compiler in ["cc", "c++", "gcc", "g++", "clang", "clang++"]:
+            wrapper = os.path.join(wrapper_folder, compiler)
+            if not os.path.lexists(wrapper):
+                os.symlink(ccache, wrapper)
+        env = Environment()
+        env.prepend_path("PATH", wrapper_folder)
+        # Every package id builds a fresh copy of the sources in its own folder; hash paths relative to it, and
+        # ignore the just-copied files' timestamps, so those builds can hit each other's cache entries.
+        # The compiler runs in the genie project folders under the source folder, so the base dir has to cover both
+        # it and the build folder, and bx's toolchain builds with -g, which would otherwise hash the working directory
+        env.define("CCACHE_BASEDIR", os.path.dirname(self.source_folder))
+        env.define("CCACHE_NOHASHDIR", "1")
+        env.define("CCACHE_SLOPPINESS", "pch_defines,time_macros,include_file_mtime,include_file_ctime")
+        env.vars(self, scope="build").save_script("conanccache")
 
     def build(self):
         # Patch rtti
         if self.options.rtti:
-            self.output.info("Disabling no-rtti.")
-            replace_in_file(self, os.path.join(self.source_folder, self._bx_folder, "scripts", "toolchain.lua"),
-                            "\"NoRTTI\",", "")
+            toolchain_lua = os.path.join(self.source_folder, self._bx_folder, "scripts", "toolchain.lua")
+            toolchain = load(self, toolchain_lua)
+            # Skipped when a previous build in the same source tree already patched it
+            if "\"NoRTTI\"," in toolchain:
+                self.output.info("Disabling no-rtti.")
+                save(self, toolchain_lua, toolchain.replace("\"NoRTTI\",", ""))
+        # Patch in link time optimization
+        if self.options.get_safe("lto"):
+            genie_lua = os.path.join(self._bimg_path, "scripts", "genie.lua")
+            genie_script = load(self, genie_lua)
+            if _LTO_GENIE_MARKER not in genie_script:
+                self.output.info("Enabling link time optimization.")
+                save(self, genie_lua, genie_script + self._lto_genie_patch)
+        if self._tmpfs_build_dir is not None:
+            self.patchBuildDirForTmpfs()
         # Patch astcenc
         # if self.settings.arch == "x86" or self.settings_build.arch == "x86":
         #     self.output.info("Disabling ASTCENC_POPCNT.")
@@ -196,79 +540,87 @@ class bimgConan(ConanFile):
         #     replace_in_file(self, os.path.join(self.source_folder, self.bimgFolder, "3rdparty", "astc-encoder", "source", "astcenc_vecmathlib_sse_4.h"),
         #         "#if ASTCENC_POPCNT >= 1", "#if false")
 
-        if is_msvc(self):
-            # Conan to Genie translation maps
-            vs_ver_to_genie = {"17": "2022", "16": "2019", "15": "2017",
-                                "194": "2022", "193": "2022", "192": "2019", "191": "2017"}
-
-            # Use genie directly, then msbuild on specific projects based on requirements
-            genie_VS = f"vs{vs_ver_to_genie[str(self.settings.compiler.version)]}"
-            genie_gen = f"{self._genie_extra} {genie_VS}"
-            self.run(f"genie {genie_gen}", cwd=self._bimg_path)
-
-            # Build with MSBuild
-            msbuild = MSBuild(self)
-            # customize to Release when RelWithDebInfo
-            msbuild.build_type = "Debug" if self.settings.build_type == "Debug" else "Release"
-            # use Win32 instead of the default value when building x86
-            msbuild.platform = "Win32" if self.settings.arch == "x86" else msbuild.platform
-            msbuild.build(os.path.join(self._bimg_path, ".build", "projects", genie_VS, "bimg.sln"), targets=self._projs)            
-        else:
-            # Not sure if XCode can be spefically handled by conan for building through, so assume everything not VS is make
-            # Use genie with gmake gen, then make on specific projects based on requirements
-            # gcc-multilib and g++-multilib required for 32bit cross-compilation, should see if we can check and install through conan
-            
-            # Conan to Genie translation maps
-            compiler_str = str(self.settings.compiler)
-            compiler_and_os_to_genie = {"Windows": f"--gcc=mingw-{compiler_str}", "Linux": f"--gcc=linux-{compiler_str}",
-                                        "FreeBSD": "--gcc=freebsd", "Macos": "--gcc=osx",
-                                        "Android": "--gcc=android", "iOS": "--gcc=ios"}
-            gmake_os_to_proj = {"Windows": "mingw", "Linux": "linux", "FreeBSD": "freebsd", "Macos": "osx", "Android": "android", "iOS": "ios"}
-            gmake_android_arch_to_genie_suffix = {"x86": "-x86", "x86_64": "-x86_64", "armv8": "-arm64", "armv7": "-arm"}
-            gmake_arch_to_genie_suffix = {"x86": "-x86", "x86_64": "-x64", "armv8": "-arm64", "armv7": "-arm"}
-            os_to_use_arch_config_suffix = {"Windows": False, "Linux": False, "FreeBSD": False, "Macos": True, "Android": True, "iOS": True}
-
-            build_type_to_make_config = {"Debug": "config=debug", "Release": "config=release"}
-            arch_to_make_config_suffix = {"x86": "32", "x86_64": "64"}
-            os_to_use_make_config_suffix = {"Windows": True, "Linux": True, "FreeBSD": True, "Macos": False, "Android": False, "iOS": False}
-
-            # Generate projects through genie
-            genie_args = f"{self._genie_extra} {compiler_and_os_to_genie[str(self.settings.os)]}"
-            if os_to_use_arch_config_suffix[str(self.settings.os)]:
-                if (self.settings.os == "Android"):
-                    genie_args += F"{gmake_android_arch_to_genie_suffix[str(self.settings.arch)]}"
-                else:
-                    genie_args += f"{gmake_arch_to_genie_suffix[str(self.settings.arch)]}"
-            genie_args += " gmake"
-            self.run(f"genie {genie_args}", cwd=self._bimg_path)
-
-            # Build project folder and path from given settings
-            proj_folder = f"gmake-{gmake_os_to_proj[str(self.settings.os)]}-{compiler_str}"
-            if os_to_use_arch_config_suffix[str(self.settings.os)]:
-                if (self.settings.os == "Android"):
-                    proj_folder += gmake_android_arch_to_genie_suffix[str(self.settings.arch)]
-                else:
-                    proj_folder += gmake_arch_to_genie_suffix[str(self.settings.arch)]
-            proj_path = os.path.sep.join([self._bimg_path, ".build", "projects", proj_folder])
-
-            # Build make args from settings
-            conf = build_type_to_make_config[str(self.settings.build_type)]
-            if os_to_use_make_config_suffix[str(self.settings.os)]:
-                conf += arch_to_make_config_suffix[str(self.settings.arch)]
-            if self.settings.os == "Windows":
-                if "msys2" in self.dependencies.build:
-                    self.run("if [ ! -d /mingw64 ]; then mkdir /mingw64; fi")
-                    self.run("pacman -Sy mingw-w64-x86_64-gcc --needed --noconfirm")
-                    mingw = "MINGW=$MSYS_ROOT/mingw64"
-                else:
-                    mingw = "MINGW=$MINGW" # user is expected to have an env var pointing to mingw; x86_64-w64-mingw32-g++ is expected in $MINGW/bin/
-                proj_path = proj_path.replace("\\", "/") # Fix path for linux style...
+        try:
+            if not self.genieUpToDate(self._genie_generated, self._genie_cmd):
+                self.run(self._genie_cmd, cwd=self._bimg_path)
+                save(self, self.genieStamp(self._genie_generated), self._genie_cmd)
+
+            if is_msvc(self):
+                self.run(self._msbuild_cmd)
             else:
-                mingw = ""
-            autotools = Autotools(self)
-            # Build with make
-            for proj in self._projs:
-                autotools.make(target=proj, args=["-R", f"-C {proj_path}", mingw, conf])
+                if self.settings.os == "Windows" and "msys2" in self.dependencies.build:
+                    self.run("if [ ! -d /mingw64 ]; then mkdir /mingw64; fi")
+                    # Skip pacman entirely when mingw's g++ is already installed, and only refresh the mirror index
+                    # (-y) when the local copy is more than a day old
+                    self.run("if [ ! -x /mingw64/bin/x86_64-w64-mingw32-g++.exe ]; then "
+                             "if [ -n \"$(find /var/lib/pacman/sync/mingw64.db -mmin -1440 2>/dev/null)\" ]; then sync=\"\"; else sync=\"y\"; fi; "
+                             "pacman -S$sync mingw-w64-x86_64-gcc --needed --noconfirm; fi")
+                autotools = Autotools(self)
+                # Build with make; all targets go in one invocation so make can schedule them in parallel
+                autotools.make(target=" ".join(self._projs), args=self._make_args)
+        except Exception:
+            # Nothing packages a failed build, so give its RAM back right away
+            if self._tmpfs_build_dir is not None:
+                rmdir(self, self._tmpfs_build_dir)
+            raise
+
+    def genieStamp(self, generated):
+        # Records the genie command line the projects next to it were generated with
+        return os.path.join(os.path.dirname(generated), "conan_genie_cmd.txt")
+
+    def genieUpToDate(self, generated, genie_cmd):
+        # genie only needs to run again when its command line (options such as --with-tools or the msvc runtime) or
+        # one of the bx or bimg scripts changed since it last wrote the projects
+        stamp = self.genieStamp(generated)
+        if not os.path.isfile(generated) or not os.path.isfile(stamp) or load(self, stamp) != genie_cmd:
+            return False
+        scripts = [os.path.join(self.source_folder, folder, "scripts") for folder in (self._bx_folder, self._bimg_folder)]
+        newest_script = max(entry.stat().st_mtime for folder in scripts for entry in os.scandir(folder) if entry.name.endswith(".lua"))
+        if newest_script > os.path.getmtime(generated):
+            return False
+        self.output.info("Projects are up to date; skipping genie.")
+        return True
+
+    def patchBuildDirForTmpfs(self):
+        # Keeps the thousands of intermediate files off the (often slow) build disk. genie is given the tmpfs folder as
+        # an absolute build dir, so the generated projects reach the sources through paths relative to where they really are;
+        # genie.lua only reads it from the environment, so builds without tmpfs_build keep using .build
+        genie_lua = os.path.join(self._bimg_path, "scripts", "genie.lua")
+        genie_script = load(self, genie_lua)
+        if _BIMG_BUILD_DIR_OVERRIDE not in genie_script:
+            genie_script, found = _BIMG_BUILD_DIR_RE.subn(lambda match: match.group(1) + _BIMG_BUILD_DIR_OVERRIDE, genie_script, count=1)
+            if not found:
+                raise ConanException("BIMG_BUILD_DIR is not set in bimg's genie.lua; build without tmpfs_build.")
+            save(self, genie_lua, genie_script)
+        os.makedirs(self._tmpfs_build_dir, exist_ok=True)
+        self.output.info(f"Building in {self._tmpfs_build_dir}.")
+
+    def matchFiles(self, src, rules, keep_path=True, skip=None):
+        # Pair each file under src with its destination file under the first rule matching its name; returns one list per rule
+        # Rules are (predicate, dst) or (predicate, dst, rename), where rename maps a file name to its packaged name
+        matches = [[] for _ in rules]
+        for root, _, files in os.walk(src):
+            for name in files:
+                if skip is not None and skip(name):
+                    continue
+                for ind, (predicate, dst, *rename) in enumerate(rules):
+                    if predicate(name):
+                        dst_folder = os.path.join(dst, os.path.relpath(root, src)) if keep_path else dst
+                        matches[ind].append((os.path.join(root, name), os.path.join(dst_folder, rename[0](name) if rename else name)))
+                        break
+        return matches
+
+    def copyFiles(self, matches):
+        for src_file, dst_file in matches:
+            os.makedirs(os.path.dirname(dst_file), exist_ok=True)
+            shutil.copy2(src_file, dst_file)
+
+    def packagedLibName(self, name, prefix):
+        # Name bimg libs consistently across platforms and configs, e.g. libbimg_encodeRelease.a -> libbimg_encode.a
+        kind = _BIMG_LIB_KIND_RE.search(name)
+        if kind is None:
+            return name
+        return f"{prefix}bimg{kind.group(1) or ''}{os.path.splitext(name)[1]}"
 
     def package(self):
         # Set platform suffixes and prefixes 
@@ -279,46 +631,56 @@ class bimgConan(ConanFile):
             lib_ext = ["*.a"]
             package_lib_prefix = "lib"
 
-        # Get build bin folder
-        for out_dir in os.listdir(os.path.join(self._bimg_path, ".build")):
-            if not out_dir=="projects":
-                build_bin = os.path.join(self._bimg_path, ".build", out_dir, "bin")
-                break
+        # Get build bin folder, only scanning .build when it is not where we expect it
+        build_bin = self._expected_build_bin
+        if build_bin is None or not os.path.isdir(build_bin):
+            for out_dir in os.listdir(self._build_dir):
+                if not out_dir=="projects":
+                    build_bin = os.path.join(self._build_dir, out_dir, "bin")
+                    break
+
+        lib_folder = os.path.join(self.package_folder, "lib")
+        bin_folder = os.path.join(self.package_folder, "bin")
+
+        # Match libs, debug info files and tools in a single walk of the build bin folder
+        # Libs get their packaged names as they are copied, so no second pass over the lib folder is needed to rename them
+        # bx is built alongside bimg but not packaged, so its files are skipped here rather than removed after copying
+        bin_rules = [(lambda name: fnmatch(name, lib_ext[0]), lib_folder, lambda name: self.packagedLibName(name, package_lib_prefix))]
+        if self.options.tools:
+            # Ahead of the debug info rule, so the tools' own debug info files go to bin with them
+            bin_rules.append((lambda name: fnmatch(name, "texturec*"), bin_folder))
+        # Debug info files are optional, so no checking
+        bin_rules.append((lambda name: any(fnmatch(name, ext) for ext in lib_ext[1:]), lib_folder))
+        bin_matches = self.matchFiles(build_bin, bin_rules, keep_path=False, skip=lambda name: "bx" in name)
+        # Check before copying anything, so a broken build fails fast
+        if len(bin_matches[0]) < self.expectedNumLibs:
+            raise Exception(self.invalidPackageExceptionText)
 
         # Copy license
-        copy(self, pattern="LICENSE", dst=os.path.join(self.package_folder, "licenses"), src=self._bimg_path)
+        os.makedirs(os.path.join(self.package_folder, "licenses"), exist_ok=True)
+        shutil.copy2(os.path.join(self._bimg_path, "LICENSE"), os.path.join(self.package_folder, "licenses"))
         # Copy includes
-        copy(self, pattern="*.h", dst=os.path.join(self.package_folder, "include"), src=os.path.join(self._bimg_path, "include"))
-        copy(self, pattern="*.inl", dst=os.path.join(self.package_folder, "include"), src=os.path.join(self._bimg_path, "include"))
-        # Copy libs
-        if len(copy(self, pattern=lib_ext[0], dst=os.path.join(self.package_folder, "lib"), src=build_bin, keep_path=False))  < self.expectedNumLibs:
-            raise Exception(self.invalidPackageExceptionText)
-        # Debug info files are optional, so no checking
-        if len(lib_ext) > 1:
-            for ind in range(1, len(lib_ext)):
-                copy(self, pattern=lib_ext[ind], dst=os.path.join(self.package_folder, "lib"), src=build_bin, keep_path=False)
+        self.copyFiles(self.matchFiles(os.path.join(self._bimg_path, "include"),
+                                       [(lambda name: name.endswith((".h", ".inl")), os.path.join(self.package_folder, "include"))])[0])
+        # Copy libs, debug info files and tools
+        for rule_matches in bin_matches:
+            self.copyFiles(rule_matches)
         
-        # Copy tools
-        if self.options.tools:
-            copy(self, pattern="texturec*", dst=os.path.join(self.package_folder, "bin"), src=build_bin, keep_path=False)
+        # Rename tools for consistency across platforms and configs
+        if self.options.tools and os.path.isdir(bin_folder):
+            with os.scandir(bin_folder) as entries:
+                bin_entries = list(entries)
+            for entry in bin_entries:
+                if "texturec" in entry.name:
+                    tool_path = os.path.join(bin_folder, f"texturec{os.path.splitext(entry.name)[1]}")
+                    # os.replace also overwrites on Windows, where os.rename fails if the target exists
+                    if entry.path != tool_path:
+                        os.replace(entry.path, tool_path)
         
-        # Rename for consistency across platforms and configs
-        for out_file in Path(os.path.join(self.package_folder, "lib")).glob("*bimg*"):
-            if out_file.suffix != ".pdb":
-                fExtra = ""
-                if out_file.name.find("encode") >= 0:
-                    fExtra = "_encode"
-                elif out_file.name.find("decode") >= 0:
-                    fExtra = "_decode"
-                rename(self, os.path.join(self.package_folder, "lib", out_file.name),
-                    os.path.join(self.package_folder, "lib", f"{package_lib_prefix}bimg{fExtra}{out_file.suffix}"))
-        if self.options.tools:
-            for out_file in Path(os.path.join(self.package_folder, "bin")).glob("*texturec*"):
-                rename(self, os.path.join(self.package_folder, "bin", out_file.name), 
-                        os.path.join(self.package_folder, "bin", f"texturec{out_file.suffix}"))
-        
-        # Clean bx stuff out of package folder
-        rm(self, pattern="*bx*", folder=os.path.join(self.package_folder, "lib")) 
+        # Give the RAM used by a tmpfs build back once everything is packaged
+        if self._tmpfs_build_dir is not None:
+            rmdir(self, self._tmpfs_build_dir)
+
         #for ext in self.libExt:
         #    rm(self, pattern=ext, folder=os.path.join(self.package_folder, "bin")) 
         #rm(self, pattern="*.exp", folder=os.path.join(self.package_folder, "bin")) 